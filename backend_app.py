@@ -3,30 +3,56 @@ backend_app.py
 FastAPI backend for PhishGuard POC.
 Provides:
 - POST /api/analyze  -> analyze a submitted URL/text
-- GET  /api/submissions -> list submissions
+- GET  /api/submissions -> list submissions (optional ?q= full-text search)
 - POST /api/feedback -> record user feedback (mark safe/malicious)
 - GET  /api/userscores -> leaderboard of user phishing awareness
 Uses SQLite (file: phishguard.db).
 """
 
 import re
-import json
+import ssl
+import asyncio
 import datetime
+import hashlib
+import ipaddress
 import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Request, Form
+from urllib.parse import urlsplit
+from fastapi import FastAPI, HTTPException, Request, Form, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
 import tldextract
-import requests
+import aiohttp
+import ahocorasick
+import orjson
+import aiosqlite
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: without it the scoring core simply runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda f: f
 
 # ---------- DB helpers ----------
 DB_FILE = "phishguard.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("""
+# aiosqlite connections opened on startup: app.state.db (autocommit) for writes,
+# app.state.db_read (read-only) for queries. Writes take this lock so they never
+# interleave with an open transaction; under WAL, reads on the separate
+# connection only ever see committed data and don't wait on the writer.
+_DB_WRITE_LOCK = asyncio.Lock()
+
+async def init_db():
+    db = app.state.db
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS submissions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id TEXT,
@@ -40,7 +66,7 @@ def init_db():
         created_at TEXT
     )
     """)
-    c.execute("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS users (
         user_id TEXT PRIMARY KEY,
         display_name TEXT,
@@ -49,32 +75,105 @@ def init_db():
         false_positives INTEGER DEFAULT 0
     )
     """)
-    conn.commit()
-    conn.close()
-
-def db_execute(query, params=()):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(query, params)
-    conn.commit()
-    lastrowid = c.lastrowid
-    conn.close()
-    return lastrowid
-
-def db_query(query, params=()):
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
+    # leaderboard ordering; submissions ORDER BY id DESC already walks the rowid b-tree
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_score ON users(correct_reports DESC, total_reports DESC)")
+    # full-text index over submission messages, kept in sync by triggers
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE name = 'submissions_fts'") as c:
+        has_fts = await c.fetchone()
+    await db.executescript("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5(message, content='submissions', content_rowid='id');
+    CREATE TRIGGER IF NOT EXISTS submissions_fts_ai AFTER INSERT ON submissions BEGIN
+        INSERT INTO submissions_fts(rowid, message) VALUES (new.id, new.message);
+    END;
+    CREATE TRIGGER IF NOT EXISTS submissions_fts_ad AFTER DELETE ON submissions BEGIN
+        INSERT INTO submissions_fts(submissions_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END;
+    CREATE TRIGGER IF NOT EXISTS submissions_fts_au AFTER UPDATE OF message ON submissions BEGIN
+        INSERT INTO submissions_fts(submissions_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO submissions_fts(rowid, message) VALUES (new.id, new.message);
+    END;
+    """)
+    if not has_fts:
+        # index rows that predate the FTS table
+        await db.execute("INSERT INTO submissions_fts(submissions_fts) VALUES ('rebuild')")
+
+async def db_execute(query, params=()):
+    async with _DB_WRITE_LOCK:
+        async with app.state.db.execute(query, params) as c:
+            return c.lastrowid
+
+async def db_query(query, params=()):
+    async with app.state.db_read.execute(query, params) as c:
+        rows = await c.fetchall()
     return [dict(r) for r in rows]
 
-# initialize DB on startup
-init_db()
+@asynccontextmanager
+async def db_transaction():
+    # explicit BEGIN/COMMIT: the shared connection is in autocommit mode
+    async with _DB_WRITE_LOCK:
+        db = app.state.db
+        await db.execute("BEGIN")
+        try:
+            yield db
+        except BaseException:
+            await db.execute("ROLLBACK")
+            raise
+        await db.execute("COMMIT")
+
+# random per process start, so ETags issued by a previous run never match
+_DB_BOOT_ID = uuid.uuid4().hex[:8]
+
+async def submissions_etag() -> str:
+    # new submissions bump MAX(id); any commit on the write connection bumps the
+    # read connection's data_version (feedback updates included)
+    rows = await db_query("""SELECT MAX(id) AS max_id,
+        (SELECT data_version FROM pragma_data_version) AS version FROM submissions""")
+    return f'"{_DB_BOOT_ID}-{rows[0]["max_id"] or 0}-{rows[0]["version"]}"'
 
 # ---------- FastAPI ----------
-app = FastAPI(title="PhishGuard Backend (POC)")
+app = FastAPI(title="PhishGuard Backend (POC)", default_response_class=ORJSONResponse)
+
+@app.on_event("startup")
+async def open_db():
+    db = await aiosqlite.connect(DB_FILE, isolation_level=None)
+    db.row_factory = aiosqlite.Row
+    await db.executescript("""
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    """)
+    app.state.db = db
+    await init_db()
+    # opened after init_db so the file and schema exist
+    db_read = await aiosqlite.connect(f"file:{DB_FILE}?mode=ro", uri=True)
+    db_read.row_factory = aiosqlite.Row
+    await db_read.executescript("""
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    """)
+    app.state.db_read = db_read
+
+@app.on_event("shutdown")
+async def close_db():
+    await app.state.db_read.close()
+    await app.state.db.close()
+
+# ---------- HTTP client ----------
+# one pooled session shared by all network probes; opened/closed with the app.
+# cert verification is off by default and enabled per request via _SSL_CTX.
+_HTTP: Optional[aiohttp.ClientSession] = None
+_SSL_CTX = ssl.create_default_context()
+
+@app.on_event("startup")
+async def open_http_session():
+    global _HTTP
+    _HTTP = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=50, ssl=False))
+
+@app.on_event("shutdown")
+async def close_http_session():
+    if _HTTP is not None:
+        await _HTTP.close()
 
 # ---------- Models ----------
 class SubmissionIn(BaseModel):
@@ -84,191 +183,322 @@ class SubmissionIn(BaseModel):
     urls: Optional[List[str]] = []
 
 # ---------- Analysis logic (heuristic/rule-based) ----------
+VERDICTS = ("safe", "suspicious", "malicious")
+
+@njit(cache=True)
+def score_from_features(kw_count: int, no_https: int, ip_hosts: int, long_doms: int, typosquats: int,
+                        bad_redirects: int, fetch_fails: int, ssl_fails: int):
+    """
+    Weights the feature counts into (verdict code, score); code indexes VERDICTS.
+    Score: 0.0 - 1.0 (higher -> more malicious)
+    """
+    score = min(0.2 * kw_count, 0.4)
+    score += 0.20 * no_https + 0.20 * ip_hosts + 0.05 * long_doms + 0.15 * typosquats
+    score += 0.10 * bad_redirects + 0.05 * fetch_fails + 0.15 * ssl_fails
+
+    # normalize score to 0-1
+    if score > 1.0:
+        score = 1.0
+
+    # thresholds to verdict
+    if score >= 0.6:
+        return 2, score
+    elif score >= 0.3:
+        return 1, score
+    return 0, score
+
+@app.on_event("startup")
+async def warm_up_scoring():
+    # with numba, the first call compiles; do it before serving instead of inside
+    # the first /api/analyze request on the event loop (no-op without numba)
+    score_from_features(0, 0, 0, 0, 0, 0, 0, 0)
+
 SUSPICIOUS_KEYWORDS = [
     "urgent", "verify", "verify your", "login", "password", "update", "confirm",
     "bank", "account", "click", "suspend", "limited", "secure", "authentication"
 ]
 
-POPULAR_BRANDS = ["google", "microsoft", "amazon", "paypal", "apple", "facebook", "aws", "netflix"]
+_URL_RE = re.compile(r"https?://[^\s'\"\)\(<>]+")
+_DOTTED_QUAD_RE = re.compile(r"^\d+\.\d+\.\d+\.\d+$")
+
+POPULAR_BRANDS = frozenset({"google", "microsoft", "amazon", "paypal", "apple", "facebook", "aws", "netflix"})
+
+def _build_automaton(words) -> ahocorasick.Automaton:
+    # Aho-Corasick automaton: finds every word occurrence in one pass over the text
+    ac = ahocorasick.Automaton()
+    for w in words:
+        ac.add_word(w, w)
+    ac.make_automaton()
+    return ac
+
+# keywords scale to large threat-intel phrase lists; brands are matched against domains
+_KW_AC = _build_automaton(SUSPICIOUS_KEYWORDS)
+_BRAND_AC = _build_automaton(POPULAR_BRANDS)
+
+# offline extractor: bundled suffix list snapshot, no HTTP fetch or disk cache
+_TLD = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
 
 def extract_urls_from_text(text: str) -> List[str]:
     if not text:
         return []
-    url_pattern = r"https?://[^\s'\"\)\(<>]+"
-    return list(set(re.findall(url_pattern, text)))
+    return list(set(_URL_RE.findall(text)))
 
 def is_https(url: str) -> bool:
     return url.lower().startswith("https://")
 
-def has_ip_hostname(url: str) -> bool:
+def has_ip_hostname(host: str) -> bool:
+    # loose dotted quad too: ipaddress rejects zero-padded/out-of-range forms
+    # like 010.10.10.10, a common way to disguise an IP in phishing links
+    if _DOTTED_QUAD_RE.match(host):
+        return True
     try:
-        host = re.sub(r"^https?://", "", url).split("/")[0]
-        return bool(re.match(r"^\d+\.\d+\.\d+\.\d+$", host))
-    except:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
         return False
 
-def domain_length(url: str) -> int:
-    ext = tldextract.extract(url)
+def domain_length(ext) -> int:
     return len(ext.domain or "")
 
-def simple_typosquat_check(url: str) -> Optional[str]:
-    ext = tldextract.extract(url)
+def simple_typosquat_check(ext) -> Optional[str]:
     domain = ext.domain or ""
-    for b in POPULAR_BRANDS:
-        if b in domain and domain != b:
-            # if brand name appears as substring but domain different -> suspicious
-            return f"possible typosquat/brand mimicry ({b})"
+    if domain in POPULAR_BRANDS:
+        # the genuine brand domain itself
+        return None
+    for _, b in _BRAND_AC.iter(domain):
+        # brand name appears as substring but domain different -> suspicious
+        return f"possible typosquat/brand mimicry ({b})"
     return None
 
+@dataclass(frozen=True)
+class UrlFeatures:
+    url: str
+    is_https: bool
+    registered_domain: str
+    ip_host: bool
+    domain_len: int
+    typosquat: Optional[str]
+
+@lru_cache(maxsize=4096)
+def url_features(url: str) -> UrlFeatures:
+    # one urlsplit + one tldextract pass per URL; the scoring loop only reads fields
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+    except ValueError:
+        # e.g. malformed IPv6 brackets
+        host = ""
+    ext = _TLD(url)
+    return UrlFeatures(
+        url=url,
+        is_https=is_https(url),
+        registered_domain=ext.registered_domain or ext.domain,
+        ip_host=has_ip_hostname(host),
+        domain_len=domain_length(ext),
+        typosquat=simple_typosquat_check(ext),
+    )
+
 def try_whois_age_days(domain:str) -> Optional[int]:
     # intentionally light and safe: we won't call WHOIS to avoid delays for POC.
     # Return None (placeholder). Later: integrate python-whois or WHOIS API.
     return None
 
-def check_ssl_certificate(domain:str) -> Optional[bool]:
-    # Lightweight: try HEAD request to https url and check TLS handshake success.
+async def count_redirects(url: str, verify_ssl: bool = False) -> int:
+    async with _HTTP.head(url, allow_redirects=True, ssl=_SSL_CTX if verify_ssl else False,
+                          timeout=aiohttp.ClientTimeout(total=6)) as r:
+        return len(r.history)
+
+async def check_ssl_certificate(domain:str) -> Optional[bool]:
+    # Lightweight: verified TLS handshake on port 443, no HTTP request at all.
     try:
-        r = requests.get(f"https://{domain}", timeout=5, allow_redirects=True)
-        return r.status_code < 500
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(domain, 443, ssl=_SSL_CTX, server_hostname=domain), timeout=3)
     except Exception:
         return False
-
-def analyze_payload(message: str, urls: List[str]):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        # the handshake already succeeded; a failed TLS shutdown doesn't change that
+        pass
+    return True
+
+# recent analysis results keyed on (message digest, sorted urls); resubmissions of the
+# same lure skip the keyword scan and network probes entirely. Results include
+# network probe outcomes (redirects, fetch/SSL failures), so entries expire.
+_ANALYSIS_CACHE_SIZE = 1024
+_ANALYSIS_CACHE_TTL = 300  # seconds
+_ANALYSIS_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+async def analyze_payload(message: str, urls: List[str]):
     """
     Returns: (verdict: str, score: float, reasons: list[str])
     Score: 0.0 - 1.0 (higher -> more malicious)
     """
+    urls = list(dict.fromkeys(urls))
+    # fixed-size digest so cached entries don't keep whole message bodies resident
+    msg_digest = hashlib.blake2b((message or "").encode(), digest_size=16).digest()
+    key = (msg_digest, tuple(sorted(urls)))
+    now = time.monotonic()
+    entry = _ANALYSIS_CACHE.get(key)
+    if entry is None or now - entry[0] > _ANALYSIS_CACHE_TTL:
+        hit = await _analyze_uncached(message, urls)
+        _ANALYSIS_CACHE[key] = (now, hit)
+        _ANALYSIS_CACHE.move_to_end(key)
+        if len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+    else:
+        hit = entry[1]
+        _ANALYSIS_CACHE.move_to_end(key)
+    verdict, score, reasons = hit
+    return verdict, score, list(reasons)
+
+async def _analyze_uncached(message: str, urls: List[str]):
+    """
+    Runs every heuristic; reasons come back as a tuple so cached results stay immutable.
+    """
     reasons = []
-    score = 0.0
 
     # keyword heuristics
+    # pyahocorasick has no case-insensitive mode, so the whole message is lowercased once
     text_lower = (message or "").lower()
-    kw_count = sum(1 for k in SUSPICIOUS_KEYWORDS if k in text_lower)
+    kw_count = len({k for _, k in _KW_AC.iter(text_lower)})
     if kw_count:
         reasons.append(f"suspicious keywords ({kw_count})")
-        score += min(0.2 * kw_count, 0.4)
 
-    # URL analysis
+    # URL analysis: count how many URLs trip each rule, score once at the end
+    no_https = ip_hosts = long_doms = typosquats = bad_redirects = fetch_fails = ssl_fails = 0
     if urls:
-        for url in urls:
-            if not is_https(url):
+        # fan out all network probes at once instead of 2 blocking calls per URL
+        parsed = [url_features(u) for u in urls]
+        # https URLs are fetched with cert verification, so that HEAD doubles as the
+        # SSL check; only plain-http URLs need a separate probe of their domain
+        redirect_results, ssl_results = await asyncio.gather(
+            asyncio.gather(*[count_redirects(p.url, verify_ssl=p.is_https) for p in parsed], return_exceptions=True),
+            asyncio.gather(*[check_ssl_certificate(p.registered_domain) for p in parsed if not p.is_https]),
+        )
+        ssl_iter = iter(ssl_results)
+
+        for p, redirects in zip(parsed, redirect_results):
+            ssl_ok = not isinstance(redirects, BaseException) if p.is_https else next(ssl_iter)
+            if not p.is_https:
                 reasons.append("no HTTPS (insecure link)")
-                score += 0.20
-            if has_ip_hostname(url):
+                no_https += 1
+            if p.ip_host:
                 reasons.append("URL uses raw IP address")
-                score += 0.20
-            dd = domain_length(url)
-            if dd and dd > 25:
+                ip_hosts += 1
+            if p.domain_len > 25:
                 reasons.append("long domain name")
-                score += 0.05
-            ts = simple_typosquat_check(url)
-            if ts:
-                reasons.append(ts)
-                score += 0.15
+                long_doms += 1
+            if p.typosquat:
+                reasons.append(p.typosquat)
+                typosquats += 1
             # redirect count heuristic
-            try:
-                r = requests.get(url, timeout=6, allow_redirects=True)
-                redirects = len(r.history)
-                if redirects >= 3:
-                    reasons.append(f"{redirects} redirects (suspicious)")
-                    score += 0.10
-            except Exception:
+            if isinstance(redirects, BaseException):
                 reasons.append("could not fetch URL (network or blocked)")
-                score += 0.05
+                fetch_fails += 1
+            elif redirects >= 3:
+                reasons.append(f"{redirects} redirects (suspicious)")
+                bad_redirects += 1
             # quick SSL check
-            ext = tldextract.extract(url)
-            domain = ext.registered_domain or ext.domain
-            ssl_ok = check_ssl_certificate(domain)
             if ssl_ok is False:
                 reasons.append("ssl certificate check failed")
-                score += 0.15
-
-    # normalize score to 0-1
-    if score > 1.0:
-        score = 1.0
-
-    # thresholds to verdict
-    if score >= 0.6:
-        verdict = "malicious"
-    elif score >= 0.3:
-        verdict = "suspicious"
-    else:
-        verdict = "safe"
-
-    return verdict, round(score, 2), reasons
+                ssl_fails += 1
+            _, partial = score_from_features(kw_count, no_https, ip_hosts, long_doms, typosquats,
+                                             bad_redirects, fetch_fails, ssl_fails)
+            if partial >= 1.0:
+                # already saturated; further URLs cannot change the verdict
+                break
+
+    verdict_code, score = score_from_features(kw_count, no_https, ip_hosts, long_doms, typosquats,
+                                              bad_redirects, fetch_fails, ssl_fails)
+    verdict = VERDICTS[verdict_code]
+
+    return verdict, round(score, 2), tuple(reasons)
+
+async def store_submission(sub: SubmissionIn, urls, verdict, score, reasons, created_at):
+    # store submission and bump (or create) the reporting user in one transaction
+    async with db_transaction() as db:
+        await db.execute("""INSERT INTO submissions
+            (user_id, source, message, urls, verdict, score, reasons, feedback, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (sub.user_id, sub.source, sub.message, orjson.dumps(urls).decode(), verdict, score, orjson.dumps(reasons).decode(), None, created_at))
+        await db.execute("""INSERT INTO users (user_id, display_name, total_reports, correct_reports, false_positives)
+            VALUES (?, ?, 1, 0, 0)
+            ON CONFLICT(user_id) DO UPDATE SET total_reports = total_reports + 1
+        """, (sub.user_id, sub.user_id))
+
+# orjson.Fragment (3.9+) embeds stored JSON text as-is; older orjson decodes it instead
+_stored_json = getattr(orjson, "Fragment", orjson.loads)
 
 # ---------- API Endpoints ----------
 @app.post("/api/analyze")
 async def analyze(sub: SubmissionIn):
     urls = sub.urls or extract_urls_from_text(sub.message or "")
-    verdict, score, reasons = analyze_payload(sub.message or "", urls)
+    verdict, score, reasons = await analyze_payload(sub.message or "", urls)
 
     created_at = datetime.datetime.utcnow().isoformat()
-
-    # store submission
-    db_execute("""INSERT INTO submissions
-        (user_id, source, message, urls, verdict, score, reasons, feedback, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (sub.user_id, sub.source, sub.message, json.dumps(urls), verdict, score, json.dumps(reasons), None, created_at))
-
-    # ensure user exists
-    user = db_query("SELECT * FROM users WHERE user_id = ?", (sub.user_id,))
-    if not user:
-        db_execute("INSERT OR REPLACE INTO users (user_id, display_name, total_reports, correct_reports, false_positives) VALUES (?, ?, ?, ?, ?)",
-                   (sub.user_id, sub.user_id, 1, 0, 0))
-    else:
-        db_execute("UPDATE users SET total_reports = total_reports + 1 WHERE user_id = ?", (sub.user_id,))
+    await store_submission(sub, urls, verdict, score, reasons, created_at)
 
     return {"verdict": verdict, "score": score, "reasons": reasons, "urls": urls, "analyzed_at": created_at}
 
 @app.get("/api/submissions")
-async def get_submissions(limit:int = 200):
-    rows = db_query("SELECT * FROM submissions ORDER BY id DESC LIMIT ?", (limit,))
-    # parse JSON fields
+async def get_submissions(request: Request, limit:int = 200, q: Optional[str] = None):
+    etag = await submissions_etag()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    if q:
+        # full-text search over messages (FTS5 query syntax)
+        try:
+            rows = await db_query("""SELECT s.* FROM submissions s
+                JOIN submissions_fts f ON f.rowid = s.id
+                WHERE submissions_fts MATCH ? ORDER BY s.id DESC LIMIT ?""", (q, limit))
+        except sqlite3.OperationalError:
+            raise HTTPException(status_code=400, detail="invalid search query")
+    else:
+        rows = await db_query("SELECT * FROM submissions ORDER BY id DESC LIMIT ?", (limit,))
+    # urls/reasons are stored as JSON text: embed them verbatim instead of
+    # decoding each one only to re-encode it for the response
     for r in rows:
         if r.get("urls"):
-            r["urls"] = json.loads(r["urls"])
+            r["urls"] = _stored_json(r["urls"])
         if r.get("reasons"):
-            r["reasons"] = json.loads(r["reasons"])
-    return {"count": len(rows), "submissions": rows}
+            r["reasons"] = _stored_json(r["reasons"])
+    body = orjson.dumps({"count": len(rows), "submissions": rows})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @app.post("/api/feedback")
 async def feedback(submission_id: int = Form(...), feedback: str = Form(...)):
     # feedback: safe | malicious
-    rows = db_query("SELECT * FROM submissions WHERE id = ?", (submission_id,))
+    rows = await db_query("SELECT * FROM submissions WHERE id = ?", (submission_id,))
     if not rows:
         raise HTTPException(status_code=404, detail="submission not found")
     sub = rows[0]
     # update submission feedback
-    db_execute("UPDATE submissions SET feedback = ? WHERE id = ?", (feedback, submission_id))
+    await db_execute("UPDATE submissions SET feedback = ? WHERE id = ?", (feedback, submission_id))
 
     # update user stats
     user_id = sub["user_id"]
     if feedback == "malicious" and sub["verdict"] == "malicious":
         # correct report
-        db_execute("UPDATE users SET correct_reports = correct_reports + 1 WHERE user_id = ?", (user_id,))
+        await db_execute("UPDATE users SET correct_reports = correct_reports + 1 WHERE user_id = ?", (user_id,))
     elif feedback == "safe" and sub["verdict"] == "safe":
-        db_execute("UPDATE users SET correct_reports = correct_reports + 1 WHERE user_id = ?", (user_id,))
+        await db_execute("UPDATE users SET correct_reports = correct_reports + 1 WHERE user_id = ?", (user_id,))
     else:
         # false positive or missed
         if feedback == "safe" and sub["verdict"] != "safe":
-            db_execute("UPDATE users SET false_positives = false_positives + 1 WHERE user_id = ?", (user_id,))
+            await db_execute("UPDATE users SET false_positives = false_positives + 1 WHERE user_id = ?", (user_id,))
         # We do not track missed maliciouss in this simple POC.
 
     return {"status": "ok", "submission_id": submission_id, "feedback": feedback}
 
 @app.get("/api/userscores")
 async def userscores():
-    rows = db_query("SELECT user_id, display_name, total_reports, correct_reports, false_positives FROM users ORDER BY (correct_reports) DESC, total_reports DESC")
-    # compute a simple awareness score 0-100
-    for r in rows:
-        total = r["total_reports"] or 0
-        correct = r["correct_reports"] or 0
-        fp = r["false_positives"] or 0
-        score = 0
-        if total > 0:
-            score = max(0, int((correct / total) * 100) - fp * 2)
-        r["awareness_score"] = score
+    # simple awareness score 0-100: % correct reports minus 2 per false positive
+    rows = await db_query("""SELECT user_id, display_name, total_reports, correct_reports, false_positives,
+        MAX(0, COALESCE(CAST(correct_reports * 100.0 / NULLIF(total_reports, 0) AS INTEGER), 0)
+               - IFNULL(false_positives, 0) * 2) AS awareness_score
+        FROM users ORDER BY (correct_reports) DESC, total_reports DESC""")
     return {"count": len(rows), "users": rows}
 
 # run server
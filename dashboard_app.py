@@ -26,31 +26,64 @@ page = st.sidebar.radio("Navigation", ["Submit", "Submissions", "Leaderboard", "
 def call_analyze(payload):
     try:
         resp = requests.post(f"{BACKEND}/api/analyze", json=payload, timeout=12)
+        clear_cached_reads()
         return resp.json()
     except Exception as e:
         return {"error": str(e)}
 
+@st.cache_resource
+def _etag_store():
+    # last (etag, payload) seen for /api/submissions, kept across reruns; stored as
+    # one tuple so concurrent sessions can't pair one response's etag with another's data
+    return {}
+
+# cached fetchers raise on failure so errors are never cached; the wrappers
+# below turn them into {"error": ...} for the pages
+@st.cache_data(ttl=10)
+def _fetch_submissions():
+    store = _etag_store()
+    last = store.get("last")
+    headers = {"If-None-Match": last[0]} if last else {}
+    resp = requests.get(f"{BACKEND}/api/submissions", headers=headers)
+    if resp.status_code == 304 and last:
+        return last[1]
+    resp.raise_for_status()
+    data = resp.json()
+    if resp.headers.get("ETag"):
+        store["last"] = (resp.headers["ETag"], data)
+    return data
+
+@st.cache_data(ttl=10)
+def _fetch_userscores():
+    resp = requests.get(f"{BACKEND}/api/userscores")
+    resp.raise_for_status()
+    return resp.json()
+
 def get_submissions():
     try:
-        resp = requests.get(f"{BACKEND}/api/submissions")
-        return resp.json()
+        return _fetch_submissions()
     except Exception as e:
         return {"error": str(e)}
 
 def get_userscores():
     try:
-        resp = requests.get(f"{BACKEND}/api/userscores")
-        return resp.json()
+        return _fetch_userscores()
     except Exception as e:
         return {"error": str(e)}
 
 def post_feedback(submission_id, feedback):
     try:
         resp = requests.post(f"{BACKEND}/api/feedback", data={"submission_id": submission_id, "feedback": feedback})
+        clear_cached_reads()
         return resp.json()
     except Exception as e:
         return {"error": str(e)}
 
+def clear_cached_reads():
+    # writes make the cached lists stale; drop them so the next render refetches
+    _fetch_submissions.clear()
+    _fetch_userscores.clear()
+
 # ---------- Pages ----------
 if page == "Submit":
     st.title("PhishGuard — Submit Suspicious Content")